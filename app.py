@@ -5,6 +5,8 @@ import smtplib
 from smtp2gmail.smtp_server import SMTPServerManager
 from smtp2gmail.smtp_server import PrintMessageHandler
 from smtp2gmail.smtp_server import GmailProxyHandler
+from smtp2gmail.smtp_server import MaildirHandler
+from smtp2gmail.smtp_server import MboxHandler
 
 def main():
     # Create and start the SMTP server
@@ -12,6 +14,9 @@ def main():
     SMTP_PORT = os.getenv("SMTP_PORT", "8025")
     SMTP_HANDLER = os.getenv("SMTP_HANDLER", "PRINT_HANDLER")
     CLIENT_SECRET_FILE = os.getenv("CLIENT_SECRET_FILE", "./client_secret.json")
+    SINK_PATH = os.getenv("SINK_PATH", "")
+    SINK_BATCH_SIZE = os.getenv("SINK_BATCH_SIZE", "1")
+    SINK_FLUSH_INTERVAL = os.getenv("SINK_FLUSH_INTERVAL", "1.0")
 
     handler_impl = None
 
@@ -23,6 +28,14 @@ def main():
             handler_impl = PrintMessageHandler()
         elif str(SMTP_HANDLER).lower() == "gmail_proxy_handler":
             handler_impl = GmailProxyHandler(client_secret_file=CLIENT_SECRET_FILE)
+        elif str(SMTP_HANDLER).lower() == "maildir_handler":
+            handler_impl = MaildirHandler(path=SINK_PATH or "./maildir")
+        elif str(SMTP_HANDLER).lower() == "mbox_handler":
+            handler_impl = MboxHandler(
+                path=SINK_PATH or "./mbox",
+                batch_size=int(SINK_BATCH_SIZE),
+                flush_interval=float(SINK_FLUSH_INTERVAL),
+            )
     except ValueError as ve:
         print(f"❌ Failed to start SMTP server with invalid environment settings: {ve}")
 
@@ -0,0 +1,372 @@
+import asyncio
+import email
+import email.message
+import inspect
+import os
+import re
+import socket
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.handlers import AsyncMessage
+
+
+def split_addresses(header_value):
+    """Split a comma separated address header into a list of addresses"""
+    if not header_value:
+        return []
+    return [addr.strip() for addr in str(header_value).split(",") if addr.strip()]
+
+
+class ParsedMessage:
+    """Email message parsed once and shared by every pipeline stage
+
+    The header and body attributes read from and write to email_msg, so
+    changes made by transform stages are seen by every sink. Setting
+    msg_plain or msg_html on a message without that part does nothing.
+    """
+
+    def __init__(self, email_msg):
+        self.email_msg = email_msg
+
+        self.plain_part = None
+        self.html_part = None
+        for part in email_msg.walk():
+            if part.is_multipart():
+                continue
+            # TODO: HANDLE ATTACHMENTS INLINE IMAGES ETC..
+            if part.get_content_type() == "text/plain":
+                self.plain_part = part
+            elif part.get_content_type() == "text/html":
+                self.html_part = part
+
+    def _set_header(self, name, value):
+        del self.email_msg[name]
+        if value:
+            self.email_msg[name] = value
+
+    def _get_body(self, part):
+        if part is None:
+            return ""
+        content = part.get_payload(decode=True)
+        if not isinstance(content, bytes):
+            return ""
+        return content.decode("utf-8", errors="ignore")
+
+    def _set_body(self, part, value):
+        if part is None:
+            return
+        # Drop the old encoding so set_payload encodes the new body for utf-8
+        del part["Content-Transfer-Encoding"]
+        part.set_payload(value, charset="utf-8")
+
+    @property
+    def sender(self):
+        return self.email_msg.get("From", "Unknown")
+
+    @sender.setter
+    def sender(self, value):
+        self._set_header("From", value)
+
+    @property
+    def to(self):
+        return self.email_msg.get("To", "")
+
+    @to.setter
+    def to(self, value):
+        self._set_header("To", value)
+
+    @property
+    def cc_list(self):
+        return split_addresses(self.email_msg.get("CC", ""))
+
+    @cc_list.setter
+    def cc_list(self, value):
+        self._set_header("CC", ", ".join(value))
+
+    @property
+    def bcc_list(self):
+        # Note: BCC usually stripped by mail servers
+        return split_addresses(self.email_msg.get("BCC", ""))
+
+    @bcc_list.setter
+    def bcc_list(self, value):
+        self._set_header("BCC", ", ".join(value))
+
+    @property
+    def subject(self):
+        return self.email_msg.get("Subject", "No Subject")
+
+    @subject.setter
+    def subject(self, value):
+        self._set_header("Subject", value)
+
+    @property
+    def msg_plain(self):
+        return self._get_body(self.plain_part)
+
+    @msg_plain.setter
+    def msg_plain(self, value):
+        self._set_body(self.plain_part, value)
+
+    @property
+    def msg_html(self):
+        return self._get_body(self.html_part)
+
+    @msg_html.setter
+    def msg_html(self, value):
+        self._set_body(self.html_part, value)
+
+
+def parse_message(message):
+    """Default parse stage, accepts a Message, bytes or str"""
+    if isinstance(message, email.message.Message):
+        # aiosmtpd has already parsed the message, don't parse it again
+        email_msg = message
+    elif isinstance(message, bytes):
+        email_msg = email.message_from_bytes(message)
+    else:
+        email_msg = email.message_from_string(str(message))
+    return ParsedMessage(email_msg)
+
+
+class MessagePipeline(AsyncMessage):
+    """SMTP handler running each message through ordered stages
+
+    parse -> filter -> transform -> route -> deliver
+
+    parser:     callable(message) returning a ParsedMessage
+    filters:    callables(parsed) returning False to drop the message
+    transforms: callables(parsed) returning the (possibly new) parsed message,
+                a transform which raises drops the message
+    router:     callable(parsed) returning the names of the sinks to deliver to,
+                all sinks are used when no router is given
+    sinks:      dict of name to sink, a sink has a deliver(parsed) method which
+                may be a coroutine, and optional flush() and close() methods
+
+    Blocking deliver() methods run on a single worker thread per sink, so
+    they never block the SMTP sessions on the event loop and each sink sees
+    its messages in order.
+    """
+
+    def __init__(self, sinks=None, parser=parse_message, filters=None,
+                 transforms=None, router=None):
+        self.sinks = dict(sinks or {})
+        self.parser = parser
+        self.filters = list(filters or [])
+        self.transforms = list(transforms or [])
+        self.router = router
+        self.executors = {
+            sink_name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sink-{sink_name}")
+            for sink_name in self.sinks
+        }
+        super().__init__()
+
+    async def handle_message(self, message):
+        """Handle incoming email messages"""
+        try:
+            parsed = self.parser(message)
+
+            for message_filter in self.filters:
+                if not message_filter(parsed):
+                    return
+
+            for transform in self.transforms:
+                parsed = transform(parsed)
+
+            if self.router:
+                sink_names = []
+                for sink_name in self.router(parsed):
+                    if sink_name in self.sinks:
+                        sink_names.append(sink_name)
+                    else:
+                        print(f"❌ Error routing message to unknown sink: {sink_name}")
+            else:
+                sink_names = list(self.sinks)
+
+        except Exception as e:
+            print(f"❌ Error processing message: {e}")
+            return
+
+        await asyncio.gather(*[self.deliver(sink_name, parsed) for sink_name in sink_names])
+
+    async def deliver(self, sink_name, parsed):
+        """Deliver a message to one sink, errors don't affect the other sinks"""
+        sink = self.sinks[sink_name]
+        try:
+            if inspect.iscoroutinefunction(sink.deliver):
+                await sink.deliver(parsed)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executors[sink_name], sink.deliver, parsed)
+        except Exception as e:
+            print(f"❌ Error delivering message to {sink_name}: {e}")
+
+    def flush(self):
+        """Flush any buffered messages in the sinks"""
+        for sink in self.sinks.values():
+            if hasattr(sink, "flush"):
+                sink.flush()
+
+    def close(self):
+        """Wait for pending deliveries, then flush and close all sinks"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        for sink in self.sinks.values():
+            if hasattr(sink, "close"):
+                sink.close()
+
+
+class PrintSink:
+    """Sink which prints email attributes to standard out"""
+
+    def deliver(self, parsed):
+        lines = [
+            "\n" + "=" * 60,
+            "📧 New Email Received",
+            "=" * 60,
+            f"From: {parsed.sender}",
+            f"Subject: {parsed.subject}",
+            f"To: {parsed.to}",
+        ]
+
+        # Print CC recipients
+        cc_list = parsed.cc_list
+        if cc_list:
+            lines.append(f"CC Recipients ({len(cc_list)}):")
+            for i, cc_addr in enumerate(cc_list, 1):
+                lines.append(f"  {i}. {cc_addr}")
+        else:
+            lines.append("CC Recipients: None")
+
+        # Print BCC recipients (usually not available in headers)
+        bcc_list = parsed.bcc_list
+        if bcc_list:
+            lines.append(f"BCC Recipients ({len(bcc_list)}):")
+            for i, bcc_addr in enumerate(bcc_list, 1):
+                lines.append(f"  {i}. {bcc_addr}")
+        else:
+            lines.append("BCC Recipients: None (typically stripped by mail servers)")
+
+        lines.append("=" * 60)
+
+        if parsed.email_msg.is_multipart():
+            lines.append(f"Root message is multipart with {len(parsed.email_msg.get_payload())} parts")
+
+        msg_plain = parsed.msg_plain
+        if msg_plain:
+            lines.append(f"Plain Message: {msg_plain}")
+
+        msg_html = parsed.msg_html
+        if msg_html:
+            lines.append(f"HTML Message: {msg_html}")
+
+        lines.append("\n")
+
+        # One print call so concurrent messages don't interleave
+        print("\n".join(lines))
+
+
+class MaildirSink:
+    """Sink which writes each message to its own file in a Maildir directory"""
+
+    def __init__(self, path="./maildir"):
+        self.path = path
+        for subdir in ("tmp", "new", "cur"):
+            os.makedirs(os.path.join(self.path, subdir), exist_ok=True)
+        self.hostname = socket.gethostname().replace("/", "\\057").replace(":", "\\072")
+        self.pid = os.getpid()
+        self.counter = 0
+
+    def deliver(self, parsed):
+        now = time.time()
+        self.counter += 1
+        name = f"{int(now)}.M{int(now * 1000000) % 1000000}P{self.pid}Q{self.counter}.{self.hostname}"
+        tmp_path = os.path.join(self.path, "tmp", name)
+        with open(tmp_path, "wb") as message_file:
+            message_file.write(parsed.email_msg.as_bytes())
+        # Maildir delivery is complete once the file is moved into new/
+        os.rename(tmp_path, os.path.join(self.path, "new", name))
+
+
+class MboxSink:
+    """Sink which appends messages to an mbox file (mboxrd format)
+
+    Each message is written as it arrives by default. With batch_size
+    greater than 1 messages are buffered and written in bulk once the batch
+    is full or the oldest buffered message is flush_interval seconds old.
+    """
+
+    FROM_LINE = re.compile(rb"^(>*From )", re.MULTILINE)
+
+    def __init__(self, path="./mbox", batch_size=1, flush_interval=1.0):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.flush_timer = None
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.mbox_file = open(self.path, "ab", buffering=1024 * 1024)
+
+    def deliver(self, parsed):
+        message_bytes = parsed.email_msg.as_bytes()
+        with self.lock:
+            self.buffer.append(message_bytes)
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+            elif self.flush_timer is None:
+                self._start_timer()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _start_timer(self):
+        self.flush_timer = threading.Timer(self.flush_interval, self._timed_flush)
+        self.flush_timer.daemon = True
+        self.flush_timer.start()
+
+    def _timed_flush(self):
+        with self.lock:
+            self.flush_timer = None
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"❌ Error writing mbox batch to {self.path}: {e}")
+                # The batch is kept, try again after the next interval
+                if self.buffer and not self.mbox_file.closed:
+                    self._start_timer()
+
+    def _flush(self):
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if not self.buffer:
+            return
+
+        separator = f"From MAILER-DAEMON {time.asctime(time.gmtime())}\n".encode()
+        chunks = []
+        for message_bytes in self.buffer:
+            message_bytes = message_bytes.replace(b"\r\n", b"\n")
+            chunks.append(separator)
+            chunks.append(self.FROM_LINE.sub(rb">\1", message_bytes))
+            if not message_bytes.endswith(b"\n"):
+                chunks.append(b"\n")
+            chunks.append(b"\n")
+        self.mbox_file.write(b"".join(chunks))
+        self.mbox_file.flush()
+        # Only drop the batch once it has been written
+        self.buffer = []
+
+    def close(self):
+        with self.lock:
+            try:
+                self._flush()
+            finally:
+                if not self.mbox_file.closed:
+                    self.mbox_file.close()
@@ -0,0 +1,273 @@
+import pytest
+import io
+import mailbox
+import os
+import time
+from email import charset
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from unittest.mock import patch, MagicMock
+
+import smtp2gmail.pipeline as Pipeline
+
+
+def create_test_email():
+    """Helper function to create a multipart test email"""
+    msg = MIMEMultipart()
+    msg["From"] = "sender@example.com"
+    msg["To"] = "recipient@example.com"
+    msg["CC"] = "cc1@example.com, cc2@example.com"
+    msg["Subject"] = "Pipeline Test"
+    msg.attach(MIMEText("From the plain body", "plain"))
+    msg.attach(MIMEText("<p>html body</p>", "html"))
+    return msg
+
+
+class CollectSink:
+    """Sink which keeps delivered messages in memory"""
+
+    def __init__(self):
+        self.delivered = []
+
+    def deliver(self, parsed):
+        self.delivered.append(parsed)
+
+
+class TestMessagePipeline:
+    """Test suite for the message pipeline stages and sinks"""
+
+    def test_parse_message(self):
+        """Test headers and bodies are extracted once by the parse stage"""
+        parsed = Pipeline.parse_message(create_test_email())
+
+        assert parsed.sender == "sender@example.com"
+        assert parsed.to == "recipient@example.com"
+        assert parsed.cc_list == ["cc1@example.com", "cc2@example.com"]
+        assert parsed.bcc_list == []
+        assert parsed.subject == "Pipeline Test"
+        assert parsed.msg_plain == "From the plain body"
+        assert parsed.msg_html == "<p>html body</p>"
+
+    def test_parse_message_reuses_parsed_message(self):
+        """Test an already parsed Message is not parsed again"""
+        msg = create_test_email()
+        parsed = Pipeline.parse_message(msg)
+        assert parsed.email_msg is msg
+
+        parsed = Pipeline.parse_message(msg.as_bytes())
+        assert parsed.subject == "Pipeline Test"
+
+    @pytest.mark.asyncio
+    async def test_filter_transform_route(self):
+        """Test stages run in order and the router selects sinks"""
+        kept = CollectSink()
+        other = CollectSink()
+
+        def upper_subject(parsed):
+            parsed.subject = parsed.subject.upper()
+            return parsed
+
+        pipeline = Pipeline.MessagePipeline(
+            sinks={"kept": kept, "other": other},
+            filters=[lambda parsed: "dropped" not in parsed.subject],
+            transforms=[upper_subject],
+            router=lambda parsed: ["kept"],
+        )
+
+        await pipeline.handle_message(create_test_email())
+        dropped = create_test_email()
+        dropped.replace_header("Subject", "dropped")
+        await pipeline.handle_message(dropped)
+
+        assert [parsed.subject for parsed in kept.delivered] == ["PIPELINE TEST"]
+        assert other.delivered == []
+
+    @pytest.mark.asyncio
+    async def test_print_sink(self):
+        """Test the print sink output"""
+        pipeline = Pipeline.MessagePipeline(sinks={"print": Pipeline.PrintSink()})
+
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            await pipeline.handle_message(create_test_email())
+            output = mock_stdout.getvalue()
+
+        assert "New Email Received" in output
+        assert "From: sender@example.com" in output
+        assert "cc2@example.com" in output
+        assert "Plain Message: From the plain body" in output
+
+    @pytest.mark.asyncio
+    async def test_unknown_and_failing_sinks(self):
+        """Test one bad route or failing sink doesn't stop the other sinks"""
+        class FailSink:
+            def deliver(self, parsed):
+                raise RuntimeError("sink failed")
+
+        kept = CollectSink()
+        pipeline = Pipeline.MessagePipeline(
+            sinks={"fail": FailSink(), "kept": kept},
+            router=lambda parsed: ["missing", "fail", "kept"],
+        )
+
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            await pipeline.handle_message(create_test_email())
+            output = mock_stdout.getvalue()
+
+        assert len(kept.delivered) == 1
+        assert "unknown sink: missing" in output
+        assert "sink failed" in output
+
+    @pytest.mark.asyncio
+    async def test_maildir_sink(self, tmp_path):
+        """Test the Maildir sink writes each message as it arrives"""
+        maildir_path = str(tmp_path / "maildir")
+        pipeline = Pipeline.MessagePipeline(sinks={"maildir": Pipeline.MaildirSink(path=maildir_path)})
+
+        for _ in range(3):
+            await pipeline.handle_message(create_test_email())
+        assert len(os.listdir(os.path.join(maildir_path, "new"))) == 3
+        assert os.listdir(os.path.join(maildir_path, "tmp")) == []
+
+        pipeline.close()
+        messages = list(mailbox.Maildir(maildir_path, create=False))
+        assert len(messages) == 3
+        assert messages[0]["Subject"] == "Pipeline Test"
+
+    @pytest.mark.asyncio
+    async def test_transform_reaches_file_sink(self, tmp_path):
+        """Test transforms change the message written by the file sinks"""
+        def rewrite(parsed):
+            parsed.subject = "CHANGED"
+            parsed.cc_list = ["cc3@example.com"]
+            parsed.msg_plain = "Rewritten body"
+            return parsed
+
+        maildir_path = str(tmp_path / "maildir")
+        pipeline = Pipeline.MessagePipeline(
+            sinks={"maildir": Pipeline.MaildirSink(path=maildir_path)},
+            transforms=[rewrite],
+        )
+        await pipeline.handle_message(create_test_email())
+        pipeline.close()
+
+        messages = list(mailbox.Maildir(maildir_path, create=False))
+        assert len(messages) == 1
+        assert messages[0]["Subject"] == "CHANGED"
+        assert messages[0]["CC"] == "cc3@example.com"
+        parsed = Pipeline.parse_message(messages[0].as_bytes())
+        assert parsed.msg_plain == "Rewritten body"
+        assert parsed.msg_html == "<p>html body</p>"
+
+    @pytest.mark.asyncio
+    async def test_transform_rewrites_encoded_bodies(self, tmp_path):
+        """Test rewritten quoted-printable and base64 bodies are re-encoded"""
+        msg = MIMEMultipart()
+        msg["From"] = "sender@example.com"
+        msg["Subject"] = "Encoded Test"
+        qp_charset = charset.Charset("utf-8")
+        qp_charset.body_encoding = charset.QP
+        msg.attach(MIMEText("Original caf\u00e9 plain", "plain", qp_charset))
+        msg.attach(MIMEText("<p>Original caf\u00e9 html</p>", "html", "utf-8"))
+        assert msg.get_payload(0)["Content-Transfer-Encoding"] == "quoted-printable"
+        assert msg.get_payload(1)["Content-Transfer-Encoding"] == "base64"
+
+        def rewrite(parsed):
+            parsed.msg_plain = "a=3Db caf\u00e9"
+            parsed.msg_html = "<p>Rewritten body</p>"
+            return parsed
+
+        mbox_path = str(tmp_path / "mail.mbox")
+        pipeline = Pipeline.MessagePipeline(
+            sinks={"mbox": Pipeline.MboxSink(path=mbox_path)},
+            transforms=[rewrite],
+        )
+        await pipeline.handle_message(msg)
+        pipeline.close()
+
+        messages = list(mailbox.mbox(mbox_path, create=False))
+        assert len(messages) == 1
+        parsed = Pipeline.parse_message(messages[0].as_bytes())
+        assert parsed.msg_plain == "a=3Db caf\u00e9"
+        assert parsed.msg_html == "<p>Rewritten body</p>"
+
+    @pytest.mark.asyncio
+    async def test_transform_missing_body_part(self):
+        """Test setting a body the message doesn't have still delivers it"""
+        def add_footer(parsed):
+            parsed.msg_plain = parsed.msg_plain + " footer"
+            parsed.msg_html = parsed.msg_html + " footer"
+            return parsed
+
+        kept = CollectSink()
+        pipeline = Pipeline.MessagePipeline(sinks={"kept": kept}, transforms=[add_footer])
+        await pipeline.handle_message(MIMEText("<p>html only</p>", "html"))
+
+        assert len(kept.delivered) == 1
+        assert kept.delivered[0].msg_plain == ""
+        assert kept.delivered[0].msg_html == "<p>html only</p> footer"
+
+    @pytest.mark.asyncio
+    async def test_mbox_sink(self, tmp_path):
+        """Test the mbox sink writes readable mboxrd files"""
+        mbox_path = str(tmp_path / "mail.mbox")
+        msg = create_test_email()
+        msg.attach(MIMEText(">From a quoted line", "plain"))
+        pipeline = Pipeline.MessagePipeline(sinks={"mbox": Pipeline.MboxSink(path=mbox_path)})
+
+        for _ in range(3):
+            await pipeline.handle_message(msg)
+        pipeline.close()
+
+        with open(mbox_path, "rb") as mbox_file:
+            lines = mbox_file.read().split(b"\n")
+        assert lines.count(b">From the plain body") == 3
+        assert lines.count(b">>From a quoted line") == 3
+        assert b">>From the plain body" not in lines
+        assert b"From the plain body" not in lines
+
+        messages = list(mailbox.mbox(mbox_path, create=False))
+        assert len(messages) == 3
+        for message in messages:
+            assert message["Subject"] == "Pipeline Test"
+
+    @pytest.mark.asyncio
+    async def test_mbox_sink_batching(self, tmp_path):
+        """Test batched mbox writes flush when full or after flush_interval"""
+        mbox_path = str(tmp_path / "mail.mbox")
+        sink = Pipeline.MboxSink(path=mbox_path, batch_size=2, flush_interval=0.2)
+        pipeline = Pipeline.MessagePipeline(sinks={"mbox": sink})
+
+        await pipeline.handle_message(create_test_email())
+        assert len(mailbox.mbox(mbox_path, create=False)) == 0
+
+        await pipeline.handle_message(create_test_email())
+        assert len(mailbox.mbox(mbox_path, create=False)) == 2
+
+        await pipeline.handle_message(create_test_email())
+        time.sleep(0.5)
+        assert len(mailbox.mbox(mbox_path, create=False)) == 3
+
+        pipeline.close()
+
+    @pytest.mark.asyncio
+    async def test_mbox_sink_keeps_batch_on_write_error(self, tmp_path):
+        """Test a failed timed flush is reported and the batch is kept"""
+        mbox_path = str(tmp_path / "mail.mbox")
+        sink = Pipeline.MboxSink(path=mbox_path, batch_size=10, flush_interval=0.1)
+        pipeline = Pipeline.MessagePipeline(sinks={"mbox": sink})
+
+        mbox_file = sink.mbox_file
+        sink.mbox_file = MagicMock(closed=False)
+        sink.mbox_file.write.side_effect = OSError("disk full")
+        with patch('sys.stdout', new_callable=io.StringIO) as mock_stdout:
+            await pipeline.handle_message(create_test_email())
+            time.sleep(0.3)
+            output = mock_stdout.getvalue()
+
+        assert "disk full" in output
+        assert len(sink.buffer) == 1
+
+        sink.mbox_file = mbox_file
+
+        pipeline.close()
+        assert len(mailbox.mbox(mbox_path, create=False)) == 1
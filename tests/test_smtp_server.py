@@ -235,6 +235,45 @@ This is a test message body."""
             assert "cc1@example.com" in output
             assert "cc2@example.com" in output
 
+    @pytest.mark.asyncio
+    async def test_gmail_proxy_handler_send_message(self):
+        """Test the GmailProxyHandler passes the parsed message to the GMAIL API"""
+        with patch.object(SMTPServer, 'Gmail') as mock_gmail:
+            handler = SMTPServer.GmailProxyHandler(client_secret_file='/tokens/client_secret.json')
+
+        mock_gmail.assert_called_once_with(
+            client_secret_file='/tokens/client_secret.json',
+            access_type='offline',
+            creds_file='/tokens/gmail_token.json',
+            noauth_local_webserver=True
+        )
+
+        # Plain and HTML bodies nested in a multipart/alternative part
+        body = MIMEMultipart('alternative')
+        body.attach(MIMEText("This is the plain body", 'plain'))
+        body.attach(MIMEText("<p>This is the HTML body</p>", 'html'))
+        msg = MIMEMultipart()
+        msg['From'] = 'sender@test.com'
+        msg['To'] = 'recipient@test.com'
+        msg['CC'] = 'cc1@test.com, cc2@test.com'
+        msg['BCC'] = 'bcc1@test.com'
+        msg['Subject'] = 'Gmail Proxy Test'
+        msg.attach(body)
+
+        await handler.handle_message(msg)
+        handler.close()
+
+        mock_gmail.return_value.send_message.assert_called_once_with(
+            to='recipient@test.com',
+            sender='sender@test.com',
+            cc=['cc1@test.com', 'cc2@test.com'],
+            bcc=['bcc1@test.com'],
+            subject='Gmail Proxy Test',
+            msg_plain='This is the plain body',
+            msg_html='<p>This is the HTML body</p>',
+            signature=False
+        )
+
     def test_create_test_email_function(self):
         """Test the create_test_email helper function"""
         msg = create_test_email()